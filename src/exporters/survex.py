@@ -4,9 +4,28 @@ Survex exporter - exports cave data to a Survex file using Jinja2 templates.
 """
 
 import os
+import shutil
+import uuid
 from jinja2 import Environment, FileSystemLoader
 from models import CaveData
 
+_STREAM_BUFFER_SIZE = 64  # template chunks joined per write
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# Jinja2 environments shared by all exporters, keyed by template directory
+_ENVIRONMENTS = {}
+
+
+def _get_environment(template_dir):
+    """
+    Return the shared Jinja2 environment for a template directory, creating it on first use.
+    """
+    env = _ENVIRONMENTS.get(template_dir)
+    if env is None:
+        env = Environment(loader=FileSystemLoader(template_dir), auto_reload=False, cache_size=-1)
+        _ENVIRONMENTS[template_dir] = env
+    return env
+
 
 class SurvexExporter:
     """
@@ -16,14 +35,31 @@ class SurvexExporter:
     def __init__(self, template_dir=None):
         if template_dir is None:
             template_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
-        self.env = Environment(loader=FileSystemLoader(template_dir))
+        self.env = _get_environment(template_dir)
+        self._template = self.env.get_template("survex_template.jinja")
 
     def export(self, data: CaveData, output_path: str, cave_name: str):
         """
         Export cave data to a Survex file.
         """
-        template = self.env.get_template("survex_template.jinja")
-        output = template.render(cave_name=cave_name, cave_data=data)
+        stream = self._template.stream(cave_name=cave_name, cave_data=data)
+        stream.enable_buffering(_STREAM_BUFFER_SIZE)
 
-        with open(output_path, "w", encoding="utf-8") as file:
-            file.write(output)
+        # Stream into a temporary file next to the output and move it into place only once rendering has
+        # finished, so that a failed export leaves any previous file untouched. A symlinked output is
+        # resolved so that the file it points to is replaced rather than the link.
+        target_path = os.path.realpath(output_path)
+        temp_path = os.path.join(
+            os.path.dirname(target_path), f".{os.path.basename(target_path)}.{uuid.uuid4().hex}.tmp"
+        )
+        # Created with the default mode, so the kernel applies the umask as for a regular new file
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with open(fd, "w", encoding="utf-8", buffering=_WRITE_BUFFER_SIZE) as file:
+                stream.dump(file)
+            if os.path.exists(target_path):
+                shutil.copymode(target_path, temp_path)
+            os.replace(temp_path, target_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
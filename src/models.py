@@ -2,8 +2,13 @@
 """
 Models for representing cave survey data.
 """
-from collections import defaultdict
-import pandas as pd
+
+
+def _invert_angles(azimuth, inclination):
+    """
+    Return the azimuth and inclination of a shot measured in the opposite direction.
+    """
+    return (azimuth + 180) % 360, -inclination
 
 
 class Trip:
@@ -11,6 +16,8 @@ class Trip:
     Represents a cave survey trip.
     """
 
+    __slots__ = ("time", "comment", "declination")
+
     def __init__(self, time, comment, declination):
         """
         Initialize a Trip instance.
@@ -30,6 +37,19 @@ class Shot:
     Represents a shot taken during a cave survey.
     """
 
+    __slots__ = (
+        "from_id",
+        "to_id",
+        "dist",
+        "azimuth",
+        "inclination",
+        "flags",
+        "roll",
+        "splay",
+        "trip_index",
+        "comment",
+    )
+
     def __init__(
         self,
         from_id,
@@ -73,9 +93,7 @@ class Shot:
         """
         Creates an inverted version of the current shot
         """
-
-        inverted_azimuth = (self.azimuth + 180) % 360
-        inverted_inclination = -self.inclination
+        inverted_azimuth, inverted_inclination = _invert_angles(self.azimuth, self.inclination)
         return Shot(
             self.to_id,
             self.from_id,
@@ -95,6 +113,8 @@ class Reference:
     Represents a reference point in a cave survey.
     """
 
+    __slots__ = ("station", "east", "north", "altitude", "comment")
+
     def __init__(self, station, east, north, altitude, comment):
         """
         Initialize a Reference instance.
@@ -118,6 +138,8 @@ class Mapping:
     Represents mapping data for a cave survey.
     """
 
+    __slots__ = ("origin", "scale")
+
     def __init__(self, origin, scale):
         """
         Initialize a Mapping instance.
@@ -135,6 +157,8 @@ class Element:
     Represents an element in the cave drawing.
     """
 
+    __slots__ = ("element_id", "data")
+
     def __init__(self, element_id, data):
         """
         Initialize an Element instance.
@@ -152,6 +176,8 @@ class Drawing:
     Represents a drawing in the cave survey.
     """
 
+    __slots__ = ("mapping", "elements")
+
     def __init__(self, mapping, elements):
         """
         Initialize a Drawing instance.
@@ -179,7 +205,13 @@ class CaveData:
         self.mapping_overview = None
         self.drawing_outline = None
         self.drawing_sideview = None
-        self.shots_dict = defaultdict(list)  # To handle duplicated shots
+        # Running sums of the repeated shots of each leg, keyed by the leg in the direction it was first
+        # measured: [count, dist, azimuth, inclination, comments]. Shots measured in the opposite direction
+        # are inverted before they are added.
+        self._legs = {}
+        # Results derived from _legs, computed on first use and reset when a leg shot is added
+        self._grouped_shots = None
+        self._total_distance = None
 
     def add_trip(self, trip):
         """
@@ -202,10 +234,26 @@ class CaveData:
         if shot.splay:
             return
 
-        # Add both normal and inverted shots to handle bidirectional shots
-        self.shots_dict[(shot.from_id, shot.to_id)].append(shot)
-        inverted = shot.inverted_shot()
-        self.shots_dict[(inverted.from_id, inverted.to_id)].append(inverted)
+        self._grouped_shots = None
+        self._total_distance = None
+        key = (shot.from_id, shot.to_id)
+        azimuth = shot.azimuth
+        inclination = shot.inclination
+        reverse_key = (shot.to_id, shot.from_id)
+        if key not in self._legs and reverse_key in self._legs:
+            key = reverse_key
+            azimuth, inclination = _invert_angles(azimuth, inclination)
+
+        leg = self._legs.get(key)
+        if leg is None:
+            self._legs[key] = [1, shot.dist, azimuth, inclination, [shot.comment] if shot.comment else []]
+        else:
+            leg[0] += 1
+            leg[1] += shot.dist
+            leg[2] += azimuth
+            leg[3] += inclination
+            if shot.comment:
+                leg[4].append(shot.comment)
 
     def add_reference(self, reference):
         """
@@ -250,37 +298,58 @@ class CaveData:
         Returns:
             float: The total distance.
         """
-        df = self.get_grouped_shots()
-        return df["dist"].sum()
+        if self._total_distance is None:
+            self._total_distance = sum(leg[1] / leg[0] for leg in self._legs.values())
+        return self._total_distance
+
+    def validate_ranges(self, max_dist):
+        """
+        Check that the distance and angles of all shots are within their valid ranges.
+
+        Args:
+            max_dist (float): The longest shot distance considered valid.
+
+        Raises:
+            ValueError: If a shot distance is outside [0, max_dist], an azimuth outside [0, 360) or an inclination
+                outside [-90, 90].
+        """
+        if not self.shots:
+            return
+        dists = [shot.dist for shot in self.shots]
+        if min(dists) < 0.0 or max(dists) > max_dist:
+            raise ValueError(f"Shot dist values should be in [0, {max_dist}]")
+        azimuths = [shot.azimuth for shot in self.shots]
+        if min(azimuths) < 0.0 or max(azimuths) >= 360.0:
+            raise ValueError("Shot azimuth values should be in [0, 360)")
+        inclinations = [shot.inclination for shot in self.shots]
+        if min(inclinations) < -90.0 or max(inclinations) > 90.0:
+            raise ValueError("Shot inclination values should be in [-90, 90]")
 
     def get_grouped_shots(self):
         """
         Get the shots grouped by 'from' and 'to' stations, with measurements averaged.
 
+        The grouping is computed once and cached; each call returns a new copy, so callers may modify it freely.
+
         Returns:
-            pd.DataFrame: DataFrame containing the grouped shots.
-        """
-        data = []
-        seen_pairs = set()
-        for (from_id, to_id), measurements in self.shots_dict.items():
-            if (from_id, to_id) not in seen_pairs:
-                seen_pairs.add((from_id, to_id))
-                seen_pairs.add((to_id, from_id))  # Mark both directions as seen
-                avg_dist = sum(m.dist for m in measurements) / len(measurements)
-                avg_azimuth = sum(m.azimuth for m in measurements) / len(measurements)
-                avg_inclination = sum(m.inclination for m in measurements) / len(measurements)
-                comment = "; ".join(m.comment for m in measurements if m.comment)
-                data.append(
-                    {
-                        "from_id": from_id,
-                        "to_id": to_id,
-                        "dist": avg_dist,
-                        "azimuth": avg_azimuth,
-                        "inclination": avg_inclination,
-                        "comment": comment,
-                    }
-                )
-
-        df = pd.DataFrame(data)
-
-        return df
+            pd.DataFrame: DataFrame with one row per leg, in the direction it was first measured, and the columns
+                from_id, to_id, dist, azimuth, inclination (averages of the repeated shots) and comment (their
+                non-empty comments joined with "; ").
+        """
+        if self._grouped_shots is not None:
+            return self._grouped_shots.copy()
+
+        # Imported here so that parsing alone does not pay for loading pandas
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+
+        df = pd.DataFrame.from_records(
+            [(from_id, to_id, *leg) for (from_id, to_id), leg in self._legs.items()],
+            columns=["from_id", "to_id", "count", "dist", "azimuth", "inclination", "comment"],
+        )
+        averaged = ["dist", "azimuth", "inclination"]
+        df[averaged] = df[averaged].div(df["count"], axis=0)
+        df["comment"] = df["comment"].map("; ".join)
+        df = df.drop(columns="count")
+
+        self._grouped_shots = df
+        return df.copy()
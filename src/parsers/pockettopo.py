@@ -12,6 +12,33 @@ import struct
 import datetime
 from models import CaveData, Trip, Shot, Reference, Mapping, Element, Drawing
 
+_BUFFER_SIZE = 1 << 20
+_ANG_SCALE = 360.0 / 65536.0  # degrees per internal angle unit
+
+# Fixed-size record layouts, compiled once
+_UINT32_STRUCT = struct.Struct("<I")
+_INT32_STRUCT = struct.Struct("<i")
+_TRIP_TIME_STRUCT = struct.Struct("<Q")
+_TRIP_DECLINATION_STRUCT = struct.Struct("<h")
+_SHOT_STRUCT = struct.Struct("<IIihhBBh")  # from, to, dist, azimuth, inclination, flags, roll, tripIndex
+_SHOT_FLAGS_OFFSET = 16  # offset of the flags byte within a shot record
+_NO_COMMENT_FLAGS = bytes(flags for flags in range(256) if not flags & 2)  # flag values without a comment
+_REFERENCE_STRUCT = struct.Struct("<Iqqi")  # station, east, north, altitude
+# A reference with an empty comment: station, east, north, altitude, comment length (0)
+_BARE_REFERENCE_STRUCT = struct.Struct("<IqqiB")
+_POINT_STRUCT = struct.Struct("<ii")  # x, y
+_MAPPING_STRUCT = struct.Struct("<iii")  # origin x, origin y, scale
+_XSECTION_STRUCT = struct.Struct("<iiIi")  # pos x, pos y, station, direction
+
+
+def _decode_id(raw_value):
+    """Decode a raw (unsigned) station ID value, see PocketTopo.read_id."""
+    if raw_value == 0x80000000:
+        return None
+    if raw_value & 0x80000000:  # negative as Int32: plain number stored + 0x80000001
+        return raw_value - 0x80000001
+    return f"{raw_value >> 16}.{raw_value & 0xFFFF}"
+
 
 class PocketTopo:
     """
@@ -26,6 +53,39 @@ class PocketTopo:
             filename (str): The path to the .top file to be read.
         """
         self.filename = filename
+        self._id_cache = {}  # raw station ID -> decoded ID, so that repeated stations share one object
+
+    def _station_id(self, raw_value):
+        """Decode a raw station ID value, reusing the result for IDs seen before."""
+        try:
+            return self._id_cache[raw_value]
+        except KeyError:
+            station_id = self._id_cache[raw_value] = _decode_id(raw_value)
+            return station_id
+
+    def _make_shot(self, record, comment=None):
+        """Build a Shot from an unpacked _SHOT_STRUCT record and its optional comment."""
+        raw_from, raw_to, dist, azimuth, inclination, flags, roll, trip_index = record
+        from_id = self._station_id(raw_from)
+        to_id = self._station_id(raw_to)
+        # TODO test and use flipped shot flag
+
+        azimuth = (azimuth * _ANG_SCALE) % 360.0
+        inclination = inclination * _ANG_SCALE
+        dist = dist / 1000.0
+
+        return Shot(
+            from_id,
+            to_id,
+            dist,
+            azimuth,
+            inclination,
+            flags,
+            roll,
+            to_id is None,
+            trip_index,
+            comment,
+        )
 
     def read_string(self, f):
         """Read a string from the file.
@@ -59,15 +119,8 @@ class PocketTopo:
                 Int32 value  // 0x80000000: undefined, <0: plain numbers + 0x80000001, >=0: major<<16|minor
         }
         """
-        (raw_value,) = struct.unpack("<I", f.read(4))
-
-        if raw_value == 0x80000000:
-            return None
-        if raw_value < 0:
-            return raw_value + 0x80000001
-        major = raw_value >> 16
-        minor = raw_value & 0xFFFF
-        return f"{major}.{minor}"
+        (raw_value,) = _UINT32_STRUCT.unpack(f.read(_UINT32_STRUCT.size))
+        return self._station_id(raw_value)
 
     def read_point(self, f):
         """Read a point consisting of x and y coordinates.
@@ -77,8 +130,7 @@ class PocketTopo:
             Int32 y  // mm
         }
         """
-        x, y = struct.unpack("<ii", f.read(8))
-        return (x, y)
+        return _POINT_STRUCT.unpack(f.read(_POINT_STRUCT.size))
 
     def read_trip(self, f):
         """Read a trip data entry from the file.
@@ -89,11 +141,11 @@ class PocketTopo:
             Int16 declination  // internal angle units (full circle = 2^16)
         }
         """
-        (time_ticks,) = struct.unpack("<Q", f.read(8))
+        (time_ticks,) = _TRIP_TIME_STRUCT.unpack(f.read(_TRIP_TIME_STRUCT.size))
         comment = self.read_string(f)
-        (declination,) = struct.unpack("<h", f.read(2))
-        declination = (declination * 360.0) / 65536.0
-        time = datetime.datetime(1, 1, 1) + datetime.timedelta(microseconds=time_ticks / 10)
+        (declination,) = _TRIP_DECLINATION_STRUCT.unpack(f.read(_TRIP_DECLINATION_STRUCT.size))
+        declination = declination * _ANG_SCALE
+        time = datetime.datetime(1, 1, 1) + datetime.timedelta(microseconds=time_ticks // 10)
         return Trip(time, comment, declination)
 
     def read_shot(self, f):
@@ -112,33 +164,32 @@ class PocketTopo:
                 String comment
         }
         """
-
-        from_id = self.read_id(f)
-        to_id = self.read_id(f)
-        (dist,) = struct.unpack("<i", f.read(4))
-        azimuth, inclination = struct.unpack("<hh", f.read(4))
-        flags, roll = struct.unpack("<BB", f.read(2))
-        # TODO test and use flipped shot flag
-        (trip_index,) = struct.unpack("<h", f.read(2))
+        record = _SHOT_STRUCT.unpack(f.read(_SHOT_STRUCT.size))
+        flags = record[5]
         comment = self.read_string(f) if flags & 2 else None
+        return self._make_shot(record, comment)
 
-        azimuth = (azimuth * 360.0) / 65536.0
-        azimuth = azimuth if azimuth >= 0 else azimuth + 360.0
-        inclination = (inclination * 360.0) / 65536.0
-        dist = dist / 1000.0
+    def read_shots(self, f, shot_count):
+        """Read an array of shot data entries from the file.
 
-        return Shot(
-            from_id,
-            to_id,
-            dist,
-            azimuth,
-            inclination,
-            flags,
-            roll,
-            to_id is None,
-            trip_index,
-            comment,
-        )
+        Shots without a comment have a fixed size, so the whole array is first read in one go. If none of the
+        shots has a comment it is unpacked in bulk, otherwise the file is rewound and read shot by shot.
+        """
+        start = f.tell()
+        size = shot_count * _SHOT_STRUCT.size
+        data = f.read(size)
+        if len(data) == size:
+            # Deleting all flag values without the comment bit leaves nothing if no shot has a comment
+            flags = data[_SHOT_FLAGS_OFFSET :: _SHOT_STRUCT.size]
+            if not flags.translate(None, _NO_COMMENT_FLAGS):
+                return self.read_shots_without_comments(data)
+
+        f.seek(start)
+        return [self.read_shot(f) for _ in range(shot_count)]
+
+    def read_shots_without_comments(self, data):
+        """Decode a block of shot records, none of which has a comment."""
+        return [self._make_shot(record) for record in _SHOT_STRUCT.iter_unpack(data)]
 
     def read_reference(self, f):
         """Read a reference data entry from the file.
@@ -151,11 +202,27 @@ class PocketTopo:
             String comment
         }
         """
-        station_id = self.read_id(f)
-        east, north = struct.unpack("<qq", f.read(16))
-        (altitude,) = struct.unpack("<i", f.read(4))
+        raw_station, east, north, altitude = _REFERENCE_STRUCT.unpack(f.read(_REFERENCE_STRUCT.size))
         comment = self.read_string(f)
-        return Reference(station_id, east, north, altitude, comment)
+        return Reference(self._station_id(raw_station), east, north, altitude, comment)
+
+    def read_references(self, f, ref_count):
+        """Read an array of reference data entries from the file.
+
+        References with an empty comment have a fixed size, so the whole array is first read in one go. If all of
+        the comments are empty it is unpacked in bulk, otherwise the file is rewound and read reference by reference.
+        """
+        start = f.tell()
+        size = ref_count * _BARE_REFERENCE_STRUCT.size
+        data = f.read(size)
+        if len(data) == size and not any(data[_REFERENCE_STRUCT.size :: _BARE_REFERENCE_STRUCT.size]):
+            return [
+                Reference(self._station_id(raw_station), east, north, altitude, "")
+                for raw_station, east, north, altitude, _ in _BARE_REFERENCE_STRUCT.iter_unpack(data)
+            ]
+
+        f.seek(start)
+        return [self.read_reference(f) for _ in range(ref_count)]
 
     def read_mapping(self, f):
         """
@@ -166,12 +233,25 @@ class PocketTopo:
             Int32 scale  // 10..50000
         }
         """
-        origin = self.read_point(f)
-        (scale,) = struct.unpack("<i", f.read(4))
-        return Mapping(origin, scale)
+        x, y, scale = _MAPPING_STRUCT.unpack(f.read(_MAPPING_STRUCT.size))
+        return Mapping((x, y), scale)
 
     def read_element(self, f):
         """
+        Read a drawing element, starting with its type byte.
+
+        Element = {
+            Byte id  // element type
+            ...
+        }
+        """
+        element_id = ord(f.read(1))
+        return self.read_element_data(f, element_id)
+
+    def read_element_data(self, f, element_id):
+        """
+        Read the data of a drawing element whose type byte has already been read.
+
         Element = {
             Byte id  // element type
             ...
@@ -191,17 +271,15 @@ class PocketTopo:
             Int32 direction // -1: horizontal, >=0; projection azimuth (internal angle units)
         }
         """
-        element_id = ord(f.read(1))
         if element_id == 1:
-            point_count = struct.unpack("<i", f.read(4))[0]
-            points = [self.read_point(f) for _ in range(point_count)]
+            (point_count,) = _INT32_STRUCT.unpack(f.read(_INT32_STRUCT.size))
+            points = list(_POINT_STRUCT.iter_unpack(f.read(point_count * _POINT_STRUCT.size)))
             color = ord(f.read(1))
             return Element(element_id, {"points": points, "color": color})
         if element_id == 3:
-            pos = self.read_point(f)
-            station = self.read_id(f)
-            direction = struct.unpack("<i", f.read(4))[0]
-            return Element(element_id, {"pos": pos, "station": station, "direction": direction})
+            x, y, raw_station, direction = _XSECTION_STRUCT.unpack(f.read(_XSECTION_STRUCT.size))
+            station = self._station_id(raw_station)
+            return Element(element_id, {"pos": (x, y), "station": station, "direction": direction})
         raise ValueError(f"Unknown element type: {element_id}")
 
     def read_drawing(self, f):
@@ -217,11 +295,13 @@ class PocketTopo:
         mapping = self.read_mapping(f)
         elements = []
         while True:
-            if f.peek(1)[:1] == b"\x00":
+            # The type byte of the next element doubles as the end of list marker
+            element_id = f.read(1)
+            if not element_id:
+                raise ValueError("Unexpected end of file while reading drawing elements.")
+            if element_id == b"\x00":
                 break
-            element = self.read_element(f)
-            elements.append(element)
-        f.read(1)
+            elements.append(self.read_element_data(f, element_id[0]))
         return Drawing(mapping, elements)
 
     def read_pockettopo_file(self):
@@ -248,18 +328,18 @@ class PocketTopo:
             Drawing sideview
         }
         """
-        with open(self.filename, "rb") as f:
+        with open(self.filename, "rb", buffering=_BUFFER_SIZE) as f:
             if f.read(4) != b"Top\x03":
                 raise ValueError("Not a PocketTopo file or unsupported version")
 
-            trip_count = struct.unpack("<i", f.read(4))[0]
+            (trip_count,) = _INT32_STRUCT.unpack(f.read(_INT32_STRUCT.size))
             trips = [self.read_trip(f) for _ in range(trip_count)]
 
-            shot_count = struct.unpack("<i", f.read(4))[0]
-            shots = [self.read_shot(f) for _ in range(shot_count)]
+            (shot_count,) = _INT32_STRUCT.unpack(f.read(_INT32_STRUCT.size))
+            shots = self.read_shots(f, shot_count)
 
-            ref_count = struct.unpack("<i", f.read(4))[0]
-            references = [self.read_reference(f) for _ in range(ref_count)]
+            (ref_count,) = _INT32_STRUCT.unpack(f.read(_INT32_STRUCT.size))
+            references = self.read_references(f, ref_count)
 
             mapping_overview = self.read_mapping(f)
             drawing_outline = self.read_drawing(f)
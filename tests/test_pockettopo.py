@@ -3,10 +3,12 @@ This module contains tests for the PocketTopo parser functionality.
 It tests various aspects of data extraction and integrity from a .top file.
 """
 
+import io
 import os
+import struct
 import datetime
 import pytest
-import pandas as pd
+from models import CaveData, Shot
 from parsers.pockettopo import PocketTopo
 
 
@@ -53,10 +55,7 @@ def test_read_pockettopo_file():
     assert cave_data.total_distance() == pytest.approx(119.0, rel=0.01)
 
     # Additional checks for shot data
-    df = pd.DataFrame([shot.__dict__ for shot in cave_data.shots])
-    assert df["dist"].between(0, 200).all(), "All dist values should be between 0 and 200"
-    assert df["azimuth"].between(0, 360).all(), "All azimuth values should be between 0 and 360"
-    assert df["inclination"].between(-90, 90).all(), "All inclination values should be between -90 and 90"
+    cave_data.validate_ranges(max_dist=200.0)
 
     # Check grouped and averaged shots
     grouped_shots = cave_data.get_grouped_shots()
@@ -64,6 +63,8 @@ def test_read_pockettopo_file():
     assert {"from_id", "to_id", "dist", "azimuth", "inclination", "comment"}.issubset(
         grouped_shots.columns
     ), "Grouped shots should have from_to, dist, azimuth, inclination and comment columns"
+    grouped_shots["dist"] *= 2
+    assert cave_data.get_grouped_shots()["dist"].sum() == pytest.approx(119.0, rel=0.01), "Grouped shots are copies"
 
 
 def test_read_pockettopo_file_dummy():
@@ -91,3 +92,118 @@ def test_read_pockettopo_file_dummy():
 
     # Check total distance
     assert cave_data.total_distance() == pytest.approx(0.0, rel=0.01)
+
+
+def test_read_id():
+    """
+    Test decoding of station IDs: undefined, major.minor and plain numbers.
+    """
+    caveconv = PocketTopo(None)
+
+    def read_id(raw_value):
+        return caveconv.read_id(io.BytesIO(struct.pack("<I", raw_value)))
+
+    assert read_id(0x80000000) is None
+    assert read_id(0x00000000) == "0.0"
+    assert read_id((1 << 16) | 23) == "1.23"
+    assert read_id(0x80000001) == 0
+    assert read_id(0x80000001 + 42) == 42
+
+
+def test_read_references():
+    """
+    Test reading references both in bulk (all comments empty) and one by one (a comment present).
+    """
+    caveconv = PocketTopo(None)
+
+    def encode_reference(reference):
+        major, minor, east, north, altitude, comment = reference
+        comment = comment.encode("utf-8")
+        return struct.pack("<Iqqi", major << 16 | minor, east, north, altitude) + bytes([len(comment)]) + comment
+
+    references = [
+        (1, 0, 5_000_000_000, -1_234, 812_000, ""),
+        (1, 7, -42, 6_000_000_000, -3_500, ""),
+        (2, 3, 0, 1, 2, ""),
+    ]
+    with_comment = references[:1] + [references[1][:5] + ("entrance",)] + references[2:]
+
+    for expected in (references, with_comment):
+        data = b"".join(encode_reference(reference) for reference in expected) + b"rest"
+        f = io.BufferedReader(io.BytesIO(data))
+        result = caveconv.read_references(f, len(expected))
+
+        assert [
+            (reference.station, reference.east, reference.north, reference.altitude, reference.comment)
+            for reference in result
+        ] == [(f"{major}.{minor}", *fields) for major, minor, *fields in expected]
+        assert f.read() == b"rest"
+
+
+def test_read_string_long():
+    """
+    Test reading a string with a multi-byte length prefix split across buffer refills.
+    """
+    caveconv = PocketTopo(None)
+    text = "Jaskinia Wielka Śnieżna " * 10
+    encoded = text.encode("utf-8")
+    assert 127 < len(encoded) < 1 << 14
+    prefix = bytes([len(encoded) & 0x7F | 0x80, len(encoded) >> 7])
+
+    f = io.BufferedReader(io.BytesIO(b"\x00" + prefix + encoded + b"rest"), buffer_size=2)
+    f.read(1)  # leaves a single buffered byte, so the length prefix is cut at the buffer boundary
+    assert caveconv.read_string(f) == text
+    assert f.tell() == 1 + len(prefix) + len(encoded)
+    assert f.read() == b"rest"
+
+
+def test_read_shots_without_comments():
+    """
+    Test that the bulk decoding of comment-free shots matches reading them one by one.
+    """
+    caveconv = PocketTopo(None)
+    records = [
+        # from, to, dist (mm), azimuth, inclination, flags, roll, tripIndex
+        (1 << 16 | 0, 1 << 16 | 1, 7196, 0x32E1, 0x1DB5, 0, 0, 0),
+        (1 << 16 | 1, 0x80000000, 2500, -0x4000, -0x2000, 1, 64, 0),  # splay, flipped
+        (0x80000001 + 5, 0x80000001 + 6, 0, 0, 0, 0, 255, -1),  # plain numbers, no trip
+        (2 << 16 | 3, 1 << 16 | 1, 123456, 0x7FFF, -0x8000, 1, 128, 3),
+    ]
+    data = b"".join(struct.pack("<IIihhBBh", *record) for record in records)
+
+    bulk = caveconv.read_shots_without_comments(data)
+    f = io.BufferedReader(io.BytesIO(data))
+    per_row = [caveconv.read_shot(f) for _ in records]
+
+    assert len(bulk) == len(records)
+    for bulk_shot, row_shot in zip(bulk, per_row):
+        for name in bulk_shot.__slots__:
+            assert getattr(bulk_shot, name) == getattr(row_shot, name), name
+    assert [shot.splay for shot in bulk] == [False, True, False, False]
+    assert bulk[1].azimuth == pytest.approx(270.0)
+
+
+def test_validate_ranges():
+    """
+    Test that shots with an out of range distance, azimuth or inclination are reported.
+    """
+
+    def cave_data_with(dist=10.0, azimuth=0.0, inclination=0.0):
+        cave_data = CaveData()
+        cave_data.add_shot(Shot("1.0", "1.1", 5.0, 359.9, -90.0, 0, 0, False, 0, None))
+        cave_data.add_shot(Shot("1.1", "1.2", dist, azimuth, inclination, 0, 0, False, 0, None))
+        return cave_data
+
+    CaveData().validate_ranges(max_dist=200.0)
+    cave_data_with(dist=200.0, inclination=90.0).validate_ranges(max_dist=200.0)
+
+    for values, field in (
+        ({"dist": -0.1}, "dist"),
+        ({"dist": 200.1}, "dist"),
+        ({"azimuth": -0.1}, "azimuth"),
+        ({"azimuth": 360.0}, "azimuth"),
+        ({"inclination": -90.1}, "inclination"),
+        ({"inclination": 90.1}, "inclination"),
+    ):
+        with pytest.raises(ValueError, match=field):
+            cave_data_with(**values).validate_ranges(max_dist=200.0)